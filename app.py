@@ -1,28 +1,44 @@
 #app.py
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_from_directory, make_response
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, flash, session, jsonify, send_from_directory, make_response
 from flask_sqlalchemy import SQLAlchemy
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import os
+import io
 from datetime import datetime, timedelta
 import json
-
-app = Flask(__name__)
-app.config['SECRET_KEY'] = 'your-secret-key-here'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///venue_booking.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# Ensure upload folder exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+import click
 
 # Import models first
 from models import db, User, Venue, Booking
-
-# Initialize SQLAlchemy with app
-db.init_app(app)
+from provisioning import provision_users, read_roster, roster_format, report_csv, write_report, MAX_UPLOAD_ROWS
+from occupancy import (record_booking, forget_booking, set_booking_status, move_user_role,
+                       rebuild_occupancy, occupancy_missing, utilisation_report, peak_hour_report, rows_csv, default_range)
+from waitlist import fill_freed_slot
+from reservations import parse_legs, reserve, lock_venue_days
+from schedule import get_schedule, init_schedule_cache, format_minutes
+
+# All routes and CLI commands live on this blueprint; create_app() wires it up
+bp = Blueprint('main', __name__, cli_group=None)
+
+def create_app(config=None):
+    """Build the application without touching the database or the filesystem"""
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'your-secret-key-here'
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///venue_booking.db'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['UPLOAD_FOLDER'] = 'uploads'
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+    app.config['WAITLIST_AUTO_PROMOTE'] = False  # Approve waitlisted requests instead of flagging them
+    if config:
+        app.config.update(config)
+    
+    # Initialize SQLAlchemy with app
+    db.init_app(app)
+    init_schedule_cache(app, db.session)
+    app.register_blueprint(bp)
+    return app
 
 # Allowed file extensions for uploads
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'doc', 'docx'}
@@ -37,11 +53,26 @@ def add_cache_headers(response):
     response.headers['Expires'] = '0'
     return response
 
+# Offer time freed by a cancellation, deletion or override to the waitlist
+# exclude holds the ids of the requests that freed the time, which must not be promoted by it
+def release_slots(venue_id, date, time_slots, notify=True, exclude=()):
+    matched = []
+    with lock_venue_days({(venue_id, date)}):
+        for time_slot in time_slots:
+            matched += fill_freed_slot(venue_id, date, time_slot, current_app.config['WAITLIST_AUTO_PROMOTE'], exclude)
+        db.session.commit()
+    if matched and notify:
+        if current_app.config['WAITLIST_AUTO_PROMOTE']:
+            flash(f'{len(matched)} waitlisted request(s) approved for the freed time.', 'info')
+        else:
+            flash(f'{len(matched)} waitlisted request(s) flagged for approval.', 'info')
+    return matched
+
 # Before request handler to check session validity
-@app.before_request
+@bp.before_app_request
 def before_request():
     # List of routes that don't require authentication
-    public_routes = ['index', 'login', 'register', 'static']
+    public_routes = ['main.index', 'main.login', 'main.register', 'static']
     
     # Check if the current route is public
     if request.endpoint in public_routes or request.endpoint.startswith('static'):
@@ -50,21 +81,21 @@ def before_request():
     # Check if user is logged in
     if 'user_id' not in session:
         flash('Please log in to access this page.', 'error')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     # Verify user still exists in database
     user = User.query.get(session['user_id'])
     if not user or not user.is_active:
         session.clear()
         flash('Your session has expired. Please log in again.', 'error')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
 # Authentication decorator
 def login_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             flash('Please log in to access this page.', 'error')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
     return decorated_function
@@ -73,11 +104,11 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             flash('Please log in to access this page.', 'error')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         user = User.query.get(session['user_id'])
         if not user or user.role != 'admin':
             flash('Admin access required.', 'error')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
     return decorated_function
@@ -86,32 +117,32 @@ def faculty_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             flash('Please log in to access this page.', 'error')
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         user = User.query.get(session['user_id'])
         if not user or user.role not in ['faculty', 'admin']:
             flash('Faculty access required.', 'error')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         return f(*args, **kwargs)
     decorated_function.__name__ = f.__name__
     return decorated_function
 
-@app.route('/')
+@bp.route('/')
 def index():
     if 'user_id' in session:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     return render_template('index.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     # Only allow admin to register new users
     if 'user_id' not in session:
         flash('Registration is disabled. Please contact administrator.', 'error')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     user = User.query.get(session['user_id'])
     if not user or user.role != 'admin':
         flash('Only administrators can register new users.', 'error')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     if request.method == 'POST':
         username = request.form['username']
@@ -133,11 +164,11 @@ def register():
         db.session.commit()
         
         flash(f'User {username} registered successfully as {role}!', 'success')
-        return redirect(url_for('admin_users'))
+        return redirect(url_for('main.admin_users'))
     
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
@@ -154,32 +185,32 @@ def login():
             session['role'] = user.role
             session['is_representative'] = user.is_representative
             flash(f'Welcome back, {user.username}!', 'success')
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('main.dashboard'))
         else:
             flash('Invalid username or password.', 'error')
     
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.clear()
     flash('You have been logged out.', 'info')
-    response = make_response(redirect(url_for('index')))
+    response = make_response(redirect(url_for('main.index')))
     return add_cache_headers(response)
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 @login_required
 def dashboard():
     user = User.query.get(session['user_id'])
     
     if user.role == 'admin':
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
     elif user.role == 'faculty':
-        return redirect(url_for('faculty_dashboard'))
+        return redirect(url_for('main.faculty_dashboard'))
     else:
-        return redirect(url_for('student_dashboard'))
+        return redirect(url_for('main.student_dashboard'))
 
-@app.route('/admin/dashboard')
+@bp.route('/admin/dashboard')
 @admin_required
 def admin_dashboard():
     bookings = Booking.query.order_by(Booking.date.desc()).all()
@@ -192,7 +223,7 @@ def admin_dashboard():
                          users=users))
     return add_cache_headers(response)
 
-@app.route('/faculty/dashboard')
+@bp.route('/faculty/dashboard')
 @faculty_required
 def faculty_dashboard():
     user = User.query.get(session['user_id'])
@@ -204,13 +235,13 @@ def faculty_dashboard():
                          venues=venues))
     return add_cache_headers(response)
 
-@app.route('/student/dashboard')
+@bp.route('/student/dashboard')
 @login_required
 def student_dashboard():
     user = User.query.get(session['user_id'])
     if user.role != 'student':
         flash('Access denied.', 'error')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     bookings = Booking.query.filter_by(user_id=user.id).order_by(Booking.date.desc()).all()
     venues = Venue.query.all()
@@ -221,7 +252,7 @@ def student_dashboard():
                          user=user))
     return add_cache_headers(response)
 
-@app.route('/booking/new', methods=['GET', 'POST'])
+@bp.route('/booking/new', methods=['GET', 'POST'])
 @login_required
 def new_booking():
     if request.method == 'POST':
@@ -233,151 +264,173 @@ def new_booking():
         # Validate time
         if end_time <= start_time:
             flash('End time must be after start time.', 'error')
-            return redirect(url_for('new_booking'))
+            return redirect(url_for('main.new_booking'))
         if start_time < '09:00' or end_time > '17:00':
             flash('Booking time must be between 09:00 and 17:00.', 'error')
-            return redirect(url_for('new_booking'))
+            return redirect(url_for('main.new_booking'))
         time_slot = f"{start_time}-{end_time}"
-        # Check for conflicts (overlap)
-        existing_bookings = Booking.query.filter_by(
-            venue_id=venue_id,
-            date=date,
-            status='Approved'
-        ).all()
-        def times_overlap(a_start, a_end, b_start, b_end):
-            return a_start < b_end and b_start < a_end
-        
-        for booking in existing_bookings:
-            b_start, b_end = booking.time_slot.split('-')
-            if times_overlap(start_time, end_time, b_start, b_end):
-                # Faculty can override both students and representatives
-                if user.role == 'faculty':
-                    if booking.user.role in ['student', 'faculty']:
-                        # Check if the existing booking is by a representative
-                        if booking.user.role == 'student' and booking.user.is_representative:
-                            # Faculty can override representatives
-                            booking.status = 'Rejected'
-                            booking.override_by = user.id
-                            db.session.commit()
-                            flash('Representative booking has been overridden by faculty.', 'warning')
-                        elif booking.user.role == 'student' and not booking.user.is_representative:
-                            # Faculty can override regular students
-                            booking.status = 'Rejected'
+        freed_slots = []
+        with lock_venue_days({(int(venue_id), date)}):
+            # Check for conflicts (overlap)
+            existing_bookings = Booking.query.filter_by(
+                venue_id=venue_id,
+                date=date,
+                status='Approved'
+            ).all()
+            def times_overlap(a_start, a_end, b_start, b_end):
+                return a_start < b_end and b_start < a_end
+            
+            for booking in existing_bookings:
+                b_start, b_end = booking.time_slot.split('-')
+                if times_overlap(start_time, end_time, b_start, b_end):
+                    # Faculty can override both students and representatives
+                    if user.role == 'faculty':
+                        if booking.user.role in ['student', 'faculty']:
+                            # Check if the existing booking is by a representative
+                            if booking.user.role == 'student' and booking.user.is_representative:
+                                # Faculty can override representatives
+                                set_booking_status(booking, 'Rejected')
+                                booking.override_by = user.id
+                                freed_slots.append(booking.time_slot)
+                                db.session.commit()
+                                flash('Representative booking has been overridden by faculty.', 'warning')
+                            elif booking.user.role == 'student' and not booking.user.is_representative:
+                                # Faculty can override regular students
+                                set_booking_status(booking, 'Rejected')
+                                booking.override_by = user.id
+                                freed_slots.append(booking.time_slot)
+                                db.session.commit()
+                                flash('Student booking has been overridden by faculty.', 'warning')
+                            else:
+                                flash('This time period is already booked by faculty.', 'error')
+                                return redirect(url_for('main.new_booking'))
+                    # Representatives can override regular students (but not other representatives or faculty)
+                    elif user.role == 'student' and user.is_representative:
+                        if booking.user.role == 'student' and not booking.user.is_representative:
+                            # Representatives can override regular students
+                            set_booking_status(booking, 'Rejected')
                             booking.override_by = user.id
+                            freed_slots.append(booking.time_slot)
                             db.session.commit()
-                            flash('Student booking has been overridden by faculty.', 'warning')
+                            flash('Regular student booking has been overridden by representative.', 'warning')
                         else:
-                            flash('This time period is already booked by faculty.', 'error')
-                            return redirect(url_for('new_booking'))
-                # Representatives can override regular students (but not other representatives or faculty)
-                elif user.role == 'student' and user.is_representative:
-                    if booking.user.role == 'student' and not booking.user.is_representative:
-                        # Representatives can override regular students
-                        booking.status = 'Rejected'
-                        booking.override_by = user.id
-                        db.session.commit()
-                        flash('Regular student booking has been overridden by representative.', 'warning')
-                    else:
-                        flash('This time period overlaps with a booking by faculty or another representative.', 'error')
-                        return redirect(url_for('new_booking'))
-                # Regular students cannot override anyone
-                elif user.role == 'student' and not user.is_representative:
-                    flash('This time period overlaps with an existing booking. Representatives and faculty have priority.', 'error')
-                    return redirect(url_for('new_booking'))
-        
-        # Handle file upload
-        document_path = None
-        if 'document' in request.files:
-            file = request.files['document']
-            if file and file.filename != '' and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                filename = f"{user.id}_{timestamp}_{filename}"
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                document_path = filename
-        
-        booking = Booking(
-            user_id=user.id,
-            venue_id=venue_id,
-            date=date,
-            time_slot=time_slot,
-            status='Pending',
-            document_path=document_path
-        )
+                            flash('This time period overlaps with a booking by faculty or another representative.', 'error')
+                            return redirect(url_for('main.new_booking'))
+                    # Regular students cannot override anyone
+                    elif user.role == 'student' and not user.is_representative:
+                        flash('This time period overlaps with an existing booking. Representatives and faculty have priority.', 'error')
+                        return redirect(url_for('main.new_booking'))
+            
+            # Handle file upload
+            document_path = None
+            if 'document' in request.files:
+                file = request.files['document']
+                if file and file.filename != '' and allowed_file(file.filename):
+                    filename = secure_filename(file.filename)
+                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                    filename = f"{user.id}_{timestamp}_{filename}"
+                    os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+                    file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
+                    document_path = filename
+            
+            booking = Booking(
+                user_id=user.id,
+                venue_id=venue_id,
+                date=date,
+                time_slot=time_slot,
+                status='Pending',
+                document_path=document_path
+            )
+            
+            db.session.add(booking)
+            db.session.flush()
+            record_booking(booking)
+            db.session.commit()
         
-        db.session.add(booking)
-        db.session.commit()
+        if freed_slots:
+            release_slots(booking.venue_id, booking.date, freed_slots, exclude={booking.id})
         
         flash('Booking request submitted successfully!', 'success')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     venues = Venue.query.all()
     response = make_response(render_template('new_booking.html', venues=venues))
     return add_cache_headers(response)
 
-@app.route('/booking/<int:booking_id>/approve')
+@bp.route('/booking/<int:booking_id>/approve')
 @admin_required
 def approve_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
     
-    # Check for conflicts with existing approved bookings
-    existing_bookings = Booking.query.filter_by(
-        venue_id=booking.venue_id,
-        date=booking.date,
-        status='Approved'
-    ).all()
-    
-    def times_overlap(a_start, a_end, b_start, b_end):
-        return a_start < b_end and b_start < a_end
-    
-    # Check if this booking conflicts with any existing approved booking
-    for existing_booking in existing_bookings:
-        if existing_booking.id != booking.id:  # Don't check against self
-            existing_start, existing_end = existing_booking.time_slot.split('-')
-            new_start, new_end = booking.time_slot.split('-')
-            
-            if times_overlap(new_start, new_end, existing_start, existing_end):
-                # Determine who should win based on hierarchy
-                if booking.user.role == 'faculty':
-                    # Faculty can override students and representatives
-                    if existing_booking.user.role in ['student', 'faculty']:
-                        existing_booking.status = 'Rejected'
-                        existing_booking.override_by = booking.user.id
-                        db.session.commit()
-                        flash(f'Faculty booking approved. {existing_booking.user.username}\'s booking has been overridden.', 'warning')
-                    else:
-                        flash('Cannot approve: This conflicts with another faculty booking.', 'error')
-                        return redirect(url_for('admin_dashboard'))
-                elif booking.user.role == 'student' and booking.user.is_representative:
-                    # Representatives can override regular students
-                    if existing_booking.user.role == 'student' and not existing_booking.user.is_representative:
-                        existing_booking.status = 'Rejected'
-                        existing_booking.override_by = booking.user.id
-                        db.session.commit()
-                        flash(f'Representative booking approved. {existing_booking.user.username}\'s booking has been overridden.', 'warning')
+    with lock_venue_days({(booking.venue_id, booking.date)}):
+        # Check for conflicts with existing approved bookings
+        existing_bookings = Booking.query.filter_by(
+            venue_id=booking.venue_id,
+            date=booking.date,
+            status='Approved'
+        ).all()
+        
+        def times_overlap(a_start, a_end, b_start, b_end):
+            return a_start < b_end and b_start < a_end
+        
+        freed_slots = []
+        
+        # Check if this booking conflicts with any existing approved booking
+        for existing_booking in existing_bookings:
+            if existing_booking.id != booking.id:  # Don't check against self
+                existing_start, existing_end = existing_booking.time_slot.split('-')
+                new_start, new_end = booking.time_slot.split('-')
+                
+                if times_overlap(new_start, new_end, existing_start, existing_end):
+                    # Determine who should win based on hierarchy
+                    if booking.user.role == 'faculty':
+                        # Faculty can override students and representatives
+                        if existing_booking.user.role in ['student', 'faculty']:
+                            set_booking_status(existing_booking, 'Rejected')
+                            existing_booking.override_by = booking.user.id
+                            freed_slots.append(existing_booking.time_slot)
+                            db.session.commit()
+                            flash(f'Faculty booking approved. {existing_booking.user.username}\'s booking has been overridden.', 'warning')
+                        else:
+                            flash('Cannot approve: This conflicts with another faculty booking.', 'error')
+                            return redirect(url_for('main.admin_dashboard'))
+                    elif booking.user.role == 'student' and booking.user.is_representative:
+                        # Representatives can override regular students
+                        if existing_booking.user.role == 'student' and not existing_booking.user.is_representative:
+                            set_booking_status(existing_booking, 'Rejected')
+                            existing_booking.override_by = booking.user.id
+                            freed_slots.append(existing_booking.time_slot)
+                            db.session.commit()
+                            flash(f'Representative booking approved. {existing_booking.user.username}\'s booking has been overridden.', 'warning')
+                        else:
+                            flash('Cannot approve: Representatives cannot override faculty or other representatives.', 'error')
+                            return redirect(url_for('main.admin_dashboard'))
                     else:
-                        flash('Cannot approve: Representatives cannot override faculty or other representatives.', 'error')
-                        return redirect(url_for('admin_dashboard'))
-                else:
-                    # Regular students cannot override anyone
-                    flash('Cannot approve: This conflicts with an existing booking. Higher priority users have precedence.', 'error')
-                    return redirect(url_for('admin_dashboard'))
-    
-    booking.status = 'Approved'
-    db.session.commit()
+                        # Regular students cannot override anyone
+                        flash('Cannot approve: This conflicts with an existing booking. Higher priority users have precedence.', 'error')
+                        return redirect(url_for('main.admin_dashboard'))
+        
+        set_booking_status(booking, 'Approved')
+        db.session.commit()
+    if freed_slots:
+        release_slots(booking.venue_id, booking.date, freed_slots)
     flash('Booking approved successfully!', 'success')
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('main.admin_dashboard'))
 
-@app.route('/booking/<int:booking_id>/reject')
+@bp.route('/booking/<int:booking_id>/reject')
 @admin_required
 def reject_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
-    booking.status = 'Rejected'
+    # Approved and flagged bookings hold time that goes back to the waitlist
+    was_holding = booking.status == 'Approved' or booking.promotion_flagged
+    set_booking_status(booking, 'Rejected')
     db.session.commit()
+    if was_holding:
+        release_slots(booking.venue_id, booking.date, [booking.time_slot])
     flash('Booking rejected.', 'info')
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('main.admin_dashboard'))
 
-@app.route('/booking/<int:booking_id>/delete')
+@bp.route('/booking/<int:booking_id>/delete')
 @login_required
 def delete_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
@@ -385,14 +438,19 @@ def delete_booking(booking_id):
     
     if user.role != 'admin' and booking.user_id != user.id:
         flash('You can only delete your own bookings.', 'error')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
+    was_holding = booking.status == 'Approved' or booking.promotion_flagged
+    venue_id, date, time_slot = booking.venue_id, booking.date, booking.time_slot
+    forget_booking(booking)
     db.session.delete(booking)
     db.session.commit()
+    if was_holding:
+        release_slots(venue_id, date, [time_slot])
     flash('Booking deleted successfully!', 'success')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
-@app.route('/booking/<int:booking_id>/cancel')
+@bp.route('/booking/<int:booking_id>/cancel')
 @login_required
 def cancel_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
@@ -401,27 +459,29 @@ def cancel_booking(booking_id):
     # Only allow cancellation if user is admin, faculty, or the booking owner
     if user.role not in ['admin', 'faculty'] and booking.user_id != user.id:
         flash('You can only cancel your own bookings.', 'error')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     # Only allow cancellation of approved bookings
     if booking.status != 'Approved':
         flash('Only approved bookings can be cancelled.', 'error')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     # Check if booking is in the past
     if booking.date < datetime.now().date():
         flash('Cannot cancel past bookings.', 'error')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
-    booking.status = 'Cancelled'
+    set_booking_status(booking, 'Cancelled')
     db.session.commit()
+    release_slots(booking.venue_id, booking.date, [booking.time_slot])
     flash('Booking cancelled successfully!', 'success')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
-@app.route('/api/availability')
+@bp.route('/api/availability')
 def check_availability():
     venue_id = request.args.get('venue_id', type=int)
     date = request.args.get('date')
+    slot_minutes = request.args.get('slot_minutes', 60, type=int)
     
     if not venue_id or not date:
         return jsonify({'error': 'Missing parameters'}), 400
@@ -431,51 +491,81 @@ def check_availability():
     except ValueError:
         return jsonify({'error': 'Invalid date format'}), 400
     
-    # Get all approved bookings for the date and venue
-    bookings = Booking.query.filter_by(
+    if not 5 <= slot_minutes <= 480:
+        return jsonify({'error': 'slot_minutes must be between 5 and 480'}), 400
+    
+    # Approved bookings for the venue-day, built once and cached until the next status change
+    schedule = get_schedule(venue_id, date_obj, lambda: Booking.query.filter_by(
         venue_id=venue_id,
         date=date_obj,
         status='Approved'
-    ).all()
-    
-    # Create time slots from 09:00 to 17:00
-    time_slots = ['09:00-10:00', '10:00-11:00', '11:00-12:00', '12:00-13:00',
-                  '13:00-14:00', '14:00-15:00', '15:00-16:00', '16:00-17:00']
-    
+    ).all())
+    
+    if request.args.get('format') == 'compact':
+        result = schedule.to_json()
+        result['free'] = schedule.free_gaps()
+        return jsonify(result)
+    if request.args.get('format') == 'binary':
+        response = make_response(schedule.to_bytes())
+        response.headers['Content-Type'] = 'application/octet-stream'
+        return response
+    
+    # Slots from 09:00 to 17:00
     results = {}
-    for slot in time_slots:
-        slot_start, slot_end = slot.split('-')
-        is_available = True
-        booked_by = None
-        user_role = None
-        
-        # Check if this slot overlaps with any booking
-        for booking in bookings:
-            booking_start, booking_end = booking.time_slot.split('-')
-            
-            # Check for overlap
-            if (slot_start < booking_end and slot_end > booking_start):
-                is_available = False
-                booked_by = booking.user.username
-                user_role = booking.user.role
-                break
-        
-        results[slot] = {
-            'available': is_available,
+    for slot_start, slot_end, owner in schedule.slots(slot_minutes):
+        booked_by, user_role = schedule.users.get(owner, (None, None))
+        results[f'{format_minutes(slot_start)}-{format_minutes(slot_end)}'] = {
+            'available': owner is None,
             'booked_by': booked_by,
             'user_role': user_role
         }
     
     return jsonify(results)
 
-@app.route('/admin/venues')
+@bp.route('/api/reservations', methods=['POST'])
+@login_required
+def create_reservation():
+    user = User.query.get(session['user_id'])
+    legs, errors = parse_legs(request.get_json(silent=True))
+    if errors:
+        return jsonify({'errors': errors}), 400
+    
+    # All legs are checked and committed together; nothing is booked if any leg conflicts
+    bookings, overridden, errors = reserve(user, legs)
+    if errors:
+        return jsonify({'errors': errors}), 409
+    
+    # One waitlist pass per freed venue-day; results go in the response since API clients never see flashes
+    freed = {}
+    for booking in overridden:
+        freed.setdefault((booking.venue_id, booking.date), []).append(booking.time_slot)
+    # The new legs are committed Pending rows, so keep them out of the pass they caused
+    own = {booking.id for booking in bookings}
+    waitlisted = []
+    for (venue_id, date), time_slots in freed.items():
+        waitlisted += release_slots(venue_id, date, time_slots, notify=False, exclude=own)
+    key = 'promoted' if current_app.config['WAITLIST_AUTO_PROMOTE'] else 'flagged'
+    
+    return jsonify({
+        'bookings': [{
+            'id': booking.id,
+            'venue_id': booking.venue_id,
+            'date': booking.date.isoformat(),
+            'time_slot': booking.time_slot,
+            'status': booking.status
+        } for booking in bookings],
+        'overridden': [booking.id for booking in overridden],
+        key: [booking.id for booking in waitlisted]
+    }), 201
+
+@bp.route('/admin/venues')
 @admin_required
 def manage_venues():
     venues = Venue.query.all()
     response = make_response(render_template('manage_venues.html', venues=venues))
     return add_cache_headers(response)
 
-@app.route('/admin/venues/add', methods=['POST'])
+@bp.route('/admin/venues/add', methods=['POST'])
 @admin_required
 def add_venue():
     name = request.form['name']
@@ -488,25 +578,64 @@ def add_venue():
     db.session.commit()
     
     flash('Venue added successfully!', 'success')
-    return redirect(url_for('manage_venues'))
+    return redirect(url_for('main.manage_venues'))
 
-@app.route('/admin/venues/<int:venue_id>/delete')
+@bp.route('/admin/venues/<int:venue_id>/delete')
 @admin_required
 def delete_venue(venue_id):
     venue = Venue.query.get_or_404(venue_id)
     db.session.delete(venue)
     db.session.commit()
     flash('Venue deleted successfully!', 'success')
-    return redirect(url_for('manage_venues'))
+    return redirect(url_for('main.manage_venues'))
 
-@app.route('/admin/users')
+def report_params():
+    # Parse the shared date range and venue filter for report endpoints
+    start, end = default_range(datetime.now().date())
+    try:
+        if request.args.get('start'):
+            start = datetime.strptime(request.args['start'], '%Y-%m-%d').date()
+        if request.args.get('end'):
+            end = datetime.strptime(request.args['end'], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+    if end < start:
+        return None
+    return start, end, request.args.get('venue_id', type=int)
+
+def report_response(name, params, rows):
+    start, end, venue_id = params
+    if request.args.get('format') == 'csv':
+        response = make_response(rows_csv(rows))
+        response.headers['Content-Type'] = 'text/csv'
+        response.headers['Content-Disposition'] = f'attachment; filename={name}_{start}_{end}.csv'
+        return response
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'venue_id': venue_id, 'rows': rows})
+
+@bp.route('/admin/reports/utilisation')
+@admin_required
+def utilisation_report_view():
+    params = report_params()
+    if not params:
+        return jsonify({'error': 'Invalid date range'}), 400
+    return report_response('utilisation', params, utilisation_report(*params))
+
+@bp.route('/admin/reports/peak-hours')
+@admin_required
+def peak_hours_report_view():
+    params = report_params()
+    if not params:
+        return jsonify({'error': 'Invalid date range'}), 400
+    return report_response('peak_hours', params, peak_hour_report(*params))
+
+@bp.route('/admin/users')
 @admin_required
 def admin_users():
     users = User.query.order_by(User.created_at.desc()).all()
     response = make_response(render_template('admin_users.html', users=users))
     return add_cache_headers(response)
 
-@app.route('/admin/users/add', methods=['GET', 'POST'])
+@bp.route('/admin/users/add', methods=['GET', 'POST'])
 @admin_required
 def add_user():
     if request.method == 'POST':
@@ -529,51 +658,80 @@ def add_user():
         db.session.commit()
         
         flash(f'User {username} created successfully!', 'success')
-        return redirect(url_for('admin_users'))
+        return redirect(url_for('main.admin_users'))
     
     return render_template('add_user.html')
 
-@app.route('/admin/users/<int:user_id>/toggle-representative')
+@bp.route('/admin/users/bulk', methods=['POST'])
+@admin_required
+def bulk_add_users():
+    file = request.files.get('roster')
+    if not file or file.filename == '':
+        flash('Please choose a roster file to upload.', 'error')
+        return redirect(url_for('main.admin_users'))
+    
+    # Hashing runs inside this request, so large rosters are left to the CLI
+    # Undecodable bytes (e.g. a cp1252 export) are replaced and the affected rows reported
+    stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', errors='replace', newline='')
+    rows = []
+    for row in read_roster(stream, roster_format(file.filename)):
+        rows.append(row)
+        if len(rows) > MAX_UPLOAD_ROWS:
+            flash(f'Rosters with more than {MAX_UPLOAD_ROWS} rows must be imported with "flask --app app provision-users".', 'error')
+            return redirect(url_for('main.admin_users'))
+    
+    created, report = provision_users(rows)
+    
+    # Return the per-row result report as a CSV download
+    response = make_response(report_csv(report))
+    response.headers['Content-Type'] = 'text/csv'
+    response.headers['Content-Disposition'] = f'attachment; filename=provisioning_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    response.headers['X-Users-Created'] = str(created)
+    return add_cache_headers(response)
+
+@bp.route('/admin/users/<int:user_id>/toggle-representative')
 @admin_required
 def toggle_representative(user_id):
     user = User.query.get_or_404(user_id)
     if user.role == 'student':
+        old_role = user.booking_role
         user.is_representative = not user.is_representative
+        move_user_role(user, old_role)
         db.session.commit()
         status = 'granted' if user.is_representative else 'revoked'
         flash(f'Representative status {status} for {user.username}', 'success')
     else:
         flash('Only students can be representatives.', 'error')
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('main.admin_users'))
 
-@app.route('/admin/users/<int:user_id>/toggle-active')
+@bp.route('/admin/users/<int:user_id>/toggle-active')
 @admin_required
 def toggle_user_active(user_id):
     user = User.query.get_or_404(user_id)
     if user.id == session['user_id']:
         flash('You cannot deactivate your own account.', 'error')
-        return redirect(url_for('admin_users'))
+        return redirect(url_for('main.admin_users'))
     
     user.is_active = not user.is_active
     db.session.commit()
     status = 'activated' if user.is_active else 'deactivated'
     flash(f'User {user.username} {status}.', 'success')
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('main.admin_users'))
 
-@app.route('/admin/users/<int:user_id>/delete')
+@bp.route('/admin/users/<int:user_id>/delete')
 @admin_required
 def delete_user(user_id):
     user = User.query.get_or_404(user_id)
     if user.id == session['user_id']:
         flash('You cannot delete your own account.', 'error')
-        return redirect(url_for('admin_users'))
+        return redirect(url_for('main.admin_users'))
     
     db.session.delete(user)
     db.session.commit()
     flash(f'User {user.username} deleted successfully.', 'success')
-    return redirect(url_for('admin_users'))
+    return redirect(url_for('main.admin_users'))
 
-@app.route('/uploads/<filename>')
+@bp.route('/uploads/<filename>')
 @login_required
 def uploaded_file(filename):
     user = User.query.get(session['user_id'])
@@ -581,42 +739,125 @@ def uploaded_file(filename):
     
     if not booking:
         flash('File not found.', 'error')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     # Only allow access if user is admin or the booking owner
     if user.role != 'admin' and booking.user_id != user.id:
         flash('Access denied.', 'error')
-        return redirect(url_for('dashboard'))
-    
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        return redirect(url_for('main.dashboard'))
+    
+    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+
+@bp.cli.command('provision-users')
+@click.argument('roster', type=click.Path(exists=True, dir_okay=False))
+@click.option('--report', 'report_path', type=click.Path(dir_okay=False), help='Where to write the per-row CSV report.')
+@click.option('--workers', type=int, default=None, help='Number of password hashing processes.')
+def provision_users_command(roster, report_path, workers):
+    """Create user accounts in bulk from a CSV or JSONL roster"""
+    with open(roster, encoding='utf-8-sig', errors='replace', newline='') as stream:
+        created, report = provision_users(read_roster(stream, roster_format(roster)), workers=workers)
+    
+    if report_path:
+        with open(report_path, 'w', newline='') as output:
+            write_report(report, output)
+    
+    failed = sum(1 for entry in report if entry['status'] != 'created')
+    click.echo(f'{created} users created, {failed} rows skipped or failed')
+
+@bp.cli.command('rebuild-occupancy')
+def rebuild_occupancy_command():
+    """Recompute the venue occupancy table from all bookings"""
+    rows = rebuild_occupancy()
+    click.echo(f'Occupancy rebuilt: {rows} venue-day-hour rows')
+
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create the database tables and the upload folder"""
+    db.create_all()
+    os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+    click.echo('Database initialised')
+
+@bp.cli.command('seed')
+def seed_command():
+    """Create the default admin account and sample venues"""
+    # Create admin user if it doesn't exist
+    admin = User.query.filter_by(username='admin').first()
+    if not admin:
+        admin = User(
+            username='admin',
+            password=generate_password_hash('admin123'),
+            role='admin'
+        )
+        db.session.add(admin)
+        db.session.commit()
+        click.echo("Admin user created: username='admin', password='admin123'")
+    
+    # Create some sample venues if they don't exist
+    if Venue.query.count() == 0:
+        venues = [
+            Venue(name='Seminar Hall A', location='Main Building', capacity=100, type='seminar_hall'),
+            Venue(name='Conference Room B', location='Engineering Block', capacity=50, type='conference_room'),
+            Venue(name='Computer Lab 1', location='IT Department', capacity=30, type='lab'),
+            Venue(name='Auditorium', location='Central Block', capacity=200, type='auditorium'),
+        ]
+        for venue in venues:
+            db.session.add(venue)
+        db.session.commit()
+        click.echo("Sample venues created")
+
+def column_ddl(column, dialect):
+    """Return (ADD COLUMN clause, backfill value or None) for a column missing from the database"""
+    column_type = column.type.compile(dialect=dialect)
+    ddl = f'"{column.name}" {column_type}'
+    default = column.default
+    if column.server_default is not None:
+        server_default = column.server_default.arg
+        if isinstance(server_default, str):
+            server_default = db.literal(server_default)
+        ddl += ' DEFAULT ' + str(server_default.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    elif default is not None and default.is_scalar:
+        literal = db.literal(default.arg, type_=column.type)
+        ddl += ' DEFAULT ' + str(literal.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+    elif default is not None and default.is_callable:
+        # Computed once for existing rows; SQLite cannot add NOT NULL columns without a constant default
+        if not column.nullable:
+            raise click.ClickException(
+                f'{column.table.name}.{column.name} is NOT NULL with a computed default; add it by hand')
+        return ddl, default.arg(None)
+    elif not column.nullable:
+        raise click.ClickException(
+            f'{column.table.name}.{column.name} is NOT NULL without a default; add it by hand')
+    if not column.nullable:
+        ddl += ' NOT NULL'
+    return ddl, None
+
+@bp.cli.command('migrate')
+def migrate_command():
+    """Create missing tables and add columns introduced since the database was created"""
+    db.create_all()
+    inspector = db.inspect(db.engine)
+    dialect = db.engine.dialect
+    
+    # Work out every change before altering anything, so an unsupported column aborts cleanly
+    changes = []
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                changes.append((table, column) + column_ddl(column, dialect))
+    
+    with db.engine.begin() as connection:
+        for table, column, ddl, backfill in changes:
+            connection.execute(db.text(f'ALTER TABLE "{table.name}" ADD COLUMN {ddl}'))
+            if backfill is not None:
+                connection.execute(table.update().values({column.name: backfill}))
+            click.echo(f'Added {table.name}.{column.name}')
+    click.echo(f'Migration complete: {len(changes)} column(s) added')
+    
+    # Occupancy counters are only maintained incrementally, so backfill them once
+    if occupancy_missing():
+        rows = rebuild_occupancy()
+        click.echo(f'Occupancy backfilled: {rows} venue-day-hour rows')
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-        
-        # Create admin user if it doesn't exist
-        admin = User.query.filter_by(username='admin').first()
-        if not admin:
-            admin = User(
-                username='admin',
-                password=generate_password_hash('admin123'),
-                role='admin'
-            )
-            db.session.add(admin)
-            db.session.commit()
-            print("Admin user created: username='admin', password='admin123'")
-        
-        # Create some sample venues if they don't exist
-        if Venue.query.count() == 0:
-            venues = [
-                Venue(name='Seminar Hall A', location='Main Building', capacity=100, type='seminar_hall'),
-                Venue(name='Conference Room B', location='Engineering Block', capacity=50, type='conference_room'),
-                Venue(name='Computer Lab 1', location='IT Department', capacity=30, type='lab'),
-                Venue(name='Auditorium', location='Central Block', capacity=200, type='auditorium'),
-            ]
-            for venue in venues:
-                db.session.add(venue)
-            db.session.commit()
-            print("Sample venues created")
-    
-    app.run(debug=True)
+    create_app().run(debug=True)
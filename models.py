@@ -15,6 +15,13 @@ class User(db.Model):
     # Relationship with bookings
     bookings = db.relationship('Booking', backref='user', lazy=True, foreign_keys='Booking.user_id')
     
+    @property
+    def booking_role(self):
+        # Representatives are tracked separately from regular students
+        if self.role == 'student' and self.is_representative:
+            return 'representative'
+        return self.role
+    
     def __repr__(self):
         return f'<User {self.username}>'
 
@@ -41,6 +48,7 @@ class Booking(db.Model):
     status = db.Column(db.String(20), default='Pending')  # Pending, Approved, Rejected, Cancelled
     document_path = db.Column(db.String(255))  # Path to uploaded permission document
     override_by = db.Column(db.Integer, db.ForeignKey('user.id'))  # Who overrode this booking
+    promotion_flagged = db.Column(db.Boolean, default=False)  # Waitlisted request whose slot has been freed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -49,3 +57,22 @@ class Booking(db.Model):
     
     def __repr__(self):
         return f'<Booking {self.id} - {self.venue.name} on {self.date}>'
+
+
+class VenueOccupancy(db.Model):
+    # Booked minutes per venue, day and hour, kept up to date on every booking status change
+    id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    hour = db.Column(db.Integer, nullable=False)  # 9 covers 09:00-10:00
+    status = db.Column(db.String(20), nullable=False)  # Pending, Approved, Rejected, Cancelled
+    role = db.Column(db.String(20), nullable=False)  # faculty, representative, student, admin
+    minutes = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        db.UniqueConstraint('venue_id', 'date', 'hour', 'status', 'role', name='uq_venue_occupancy'),
+        db.Index('ix_venue_occupancy_date', 'date', 'status'),
+    )
+    
+    def __repr__(self):
+        return f'<VenueOccupancy {self.venue_id} {self.date} {self.hour}:00 {self.status}/{self.role} {self.minutes}m>'
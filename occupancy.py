@@ -0,0 +1,225 @@
+#occupancy.py
+"""
+Incrementally maintained venue occupancy and the reports built on it
+"""
+
+import csv
+import io
+from collections import defaultdict
+from datetime import timedelta
+
+from sqlalchemy import func
+
+from models import db, Booking, Venue, VenueOccupancy
+from schedule import to_minutes, mark_schedule_changed
+
+# Bookable hours, 09:00 to 17:00
+OPEN_HOUR = 9
+CLOSE_HOUR = 17
+MINUTES_PER_DAY = (CLOSE_HOUR - OPEN_HOUR) * 60
+
+BOOKING_ROLES = ['faculty', 'representative', 'student', 'admin']
+BOOKING_STATUSES = ['Pending', 'Approved', 'Rejected', 'Cancelled']
+
+# Columns of the uq_venue_occupancy constraint
+OCCUPANCY_KEY = ['venue_id', 'date', 'hour', 'status', 'role']
+
+def hourly_minutes(time_slot):
+    """Split a 'HH:MM-HH:MM' slot into {hour: minutes booked in that hour}"""
+    start, end = (to_minutes(part) for part in time_slot.split('-'))
+    result = {}
+    for hour in range(start // 60, (end + 59) // 60):
+        overlap = min(end, (hour + 1) * 60) - max(start, hour * 60)
+        if overlap > 0:
+            result[hour] = overlap
+    return result
+
+def _adjust(venue_id, date, status, role, time_slot, sign):
+    """Add (sign=1) or remove (sign=-1) a slot's minutes from the occupancy table"""
+    mark_schedule_changed(db.session, venue_id, date)
+    hours = hourly_minutes(time_slot)
+    _increment([
+        {'venue_id': int(venue_id), 'date': date, 'hour': hour,
+         'status': status, 'role': role, 'minutes': sign * minutes}
+        for hour, minutes in hours.items()
+    ])
+    # Drop buckets that are back to zero; negative totals are left visible as drift
+    VenueOccupancy.query.filter(
+        VenueOccupancy.venue_id == venue_id,
+        VenueOccupancy.date == date,
+        VenueOccupancy.status == status,
+        VenueOccupancy.role == role,
+        VenueOccupancy.hour.in_(list(hours)),
+        VenueOccupancy.minutes == 0
+    ).delete(synchronize_session=False)
+
+def _increment(values):
+    """Add minutes to occupancy rows with a single SQL upsert, so concurrent writers cannot lose updates"""
+    # Dialect modules are imported on first use so startup only pays for the one in use
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('mysql', 'mariadb'):
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(VenueOccupancy).values(values)
+        statement = statement.on_duplicate_key_update(
+            minutes=VenueOccupancy.minutes + statement.inserted.minutes)
+    else:
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(VenueOccupancy).values(values)
+        statement = statement.on_conflict_do_update(
+            index_elements=OCCUPANCY_KEY,
+            set_={'minutes': VenueOccupancy.minutes + statement.excluded.minutes})
+    db.session.execute(statement)
+
+def record_booking(booking):
+    """Count a newly created booking under its current status"""
+    _adjust(booking.venue_id, booking.date, booking.status or 'Pending',
+            booking.user.booking_role, booking.time_slot, 1)
+
+def forget_booking(booking):
+    """Remove a booking that is about to be deleted"""
+    _adjust(booking.venue_id, booking.date, booking.status or 'Pending',
+            booking.user.booking_role, booking.time_slot, -1)
+
+def set_booking_status(booking, status):
+    """Change a booking's status and move its minutes to the new status bucket"""
+    old_status = booking.status or 'Pending'
+    if old_status == status:
+        return
+    role = booking.user.booking_role
+    _adjust(booking.venue_id, booking.date, old_status, role, booking.time_slot, -1)
+    _adjust(booking.venue_id, booking.date, status, role, booking.time_slot, 1)
+    booking.status = status
+    if status != 'Pending':
+        booking.promotion_flagged = False
+    if status == 'Approved':
+        _clear_overlapping_flags(booking)
+
+def _clear_overlapping_flags(booking):
+    """Unflag waitlisted requests whose freed time has just been taken by another approval"""
+    start, end = (to_minutes(part) for part in booking.time_slot.split('-'))
+    flagged = Booking.query.filter(
+        Booking.venue_id == booking.venue_id,
+        Booking.date == booking.date,
+        Booking.status == 'Pending',
+        Booking.promotion_flagged.is_(True),
+        Booking.id != booking.id
+    )
+    for other in flagged:
+        other_start, other_end = (to_minutes(part) for part in other.time_slot.split('-'))
+        if other_start < end and start < other_end:
+            other.promotion_flagged = False
+
+def move_user_role(user, old_role):
+    """Move a user's bookings to their new role bucket after a role change"""
+    new_role = user.booking_role
+    if old_role == new_role:
+        return
+    for booking in user.bookings:
+        status = booking.status or 'Pending'
+        _adjust(booking.venue_id, booking.date, status, old_role, booking.time_slot, -1)
+        _adjust(booking.venue_id, booking.date, status, new_role, booking.time_slot, 1)
+
+def rebuild_occupancy():
+    """Recompute the whole occupancy table from the booking rows"""
+    totals = defaultdict(int)
+    for booking in Booking.query.all():
+        key = (booking.venue_id, booking.date, booking.status or 'Pending', booking.user.booking_role)
+        for hour, minutes in hourly_minutes(booking.time_slot).items():
+            totals[key + (hour,)] += minutes
+
+    VenueOccupancy.query.delete()
+    db.session.add_all([
+        VenueOccupancy(venue_id=venue_id, date=date, status=status, role=role, hour=hour, minutes=minutes)
+        for (venue_id, date, status, role, hour), minutes in totals.items()
+    ])
+    db.session.commit()
+    return len(totals)
+
+def occupancy_missing():
+    """Whether bookings exist but the occupancy table has never been filled"""
+    return Booking.query.first() is not None and VenueOccupancy.query.first() is None
+
+def _day_count(start, end):
+    return (end - start).days + 1
+
+def utilisation_report(start, end, venue_id=None):
+    """Per-venue booked minutes by status and role, and approved utilisation"""
+    venues = Venue.query.order_by(Venue.name)
+    if venue_id:
+        venues = venues.filter(Venue.id == venue_id)
+    venues = venues.all()
+
+    query = db.session.query(
+        VenueOccupancy.venue_id, VenueOccupancy.status, VenueOccupancy.role,
+        func.sum(VenueOccupancy.minutes)
+    ).filter(
+        VenueOccupancy.date >= start,
+        VenueOccupancy.date <= end
+    )
+    if venue_id:
+        query = query.filter(VenueOccupancy.venue_id == venue_id)
+    totals = defaultdict(int)
+    for row_venue, status, role, minutes in query.group_by(
+            VenueOccupancy.venue_id, VenueOccupancy.status, VenueOccupancy.role):
+        totals[(row_venue, status, role)] = minutes or 0
+
+    available = _day_count(start, end) * MINUTES_PER_DAY
+    rows = []
+    for venue in venues:
+        row = {'venue_id': venue.id, 'venue': venue.name}
+        for status in BOOKING_STATUSES:
+            row[f'{status.lower()}_minutes'] = sum(totals[(venue.id, status, role)] for role in BOOKING_ROLES)
+        for role in BOOKING_ROLES:
+            row[f'approved_{role}_minutes'] = totals[(venue.id, 'Approved', role)]
+        row['available_minutes'] = available
+        row['utilisation'] = round(row['approved_minutes'] / available, 4) if available else 0.0
+        rows.append(row)
+    return rows
+
+def peak_hour_report(start, end, venue_id=None):
+    """Approved and requested minutes per hour of day, busiest hour first"""
+    query = db.session.query(
+        VenueOccupancy.hour, VenueOccupancy.status, func.sum(VenueOccupancy.minutes)
+    ).filter(
+        VenueOccupancy.date >= start,
+        VenueOccupancy.date <= end,
+        VenueOccupancy.status.in_(['Approved', 'Pending'])
+    )
+    if venue_id:
+        query = query.filter(VenueOccupancy.venue_id == venue_id)
+        venue_count = 1
+    else:
+        venue_count = Venue.query.count()
+    totals = defaultdict(int)
+    for hour, status, minutes in query.group_by(VenueOccupancy.hour, VenueOccupancy.status):
+        totals[(hour, status)] = minutes or 0
+
+    available = _day_count(start, end) * venue_count * 60
+    rows = []
+    for hour in range(OPEN_HOUR, CLOSE_HOUR):
+        approved = totals[(hour, 'Approved')]
+        rows.append({
+            'hour': f'{hour:02d}:00-{hour + 1:02d}:00',
+            'approved_minutes': approved,
+            'pending_minutes': totals[(hour, 'Pending')],
+            'available_minutes': available,
+            'utilisation': round(approved / available, 4) if available else 0.0,
+        })
+    rows.sort(key=lambda row: row['approved_minutes'], reverse=True)
+    return rows
+
+def rows_csv(rows):
+    """Render a list of report rows as CSV"""
+    output = io.StringIO()
+    if rows:
+        writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return output.getvalue()
+
+def default_range(today):
+    """Last 30 days up to and including today"""
+    return today - timedelta(days=29), today
@@ -0,0 +1,220 @@
+#provisioning.py
+"""
+Bulk user provisioning from CSV or JSONL rosters
+"""
+
+import csv
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy.exc import IntegrityError
+from werkzeug.security import generate_password_hash
+
+from models import db, User
+
+# Roles that can be provisioned in bulk (admins are still created by hand)
+PROVISION_ROLES = ['faculty', 'student']
+
+# Number of accounts inserted per transaction
+CHUNK_SIZE = 500
+
+# Chunks smaller than this are hashed in-process; starting worker processes costs more
+POOL_THRESHOLD = 32
+
+# Largest roster accepted by the web upload; bigger ones go through `flask provision-users`.
+# A password hash costs about 0.3 s of CPU, so this keeps an upload well inside a 30 s request timeout
+MAX_UPLOAD_ROWS = 50
+
+# Rosters are decoded with errors='replace'; rows holding this character came from undecodable bytes
+REPLACEMENT_CHAR = '\ufffd'
+
+REPORT_FIELDS = ['row', 'username', 'status', 'message']
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+
+def roster_format(filename):
+    """Guess the roster format from its file name"""
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'csv'
+
+def read_roster(stream, fmt='csv'):
+    """Yield (row_number, record) pairs from a text stream, one row at a time"""
+    if fmt == 'jsonl':
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield number, record if isinstance(record, dict) else None
+    else:
+        # Line 1 is the header row
+        for number, record in enumerate(csv.DictReader(stream), start=2):
+            yield number, record
+
+def parse_record(record):
+    """Validate a roster record, returning (fields, error)"""
+    if record is None:
+        return None, 'Malformed row'
+    if any(REPLACEMENT_CHAR in str(value) for value in record.values()):
+        return None, 'Row is not valid UTF-8; save the roster as UTF-8'
+
+    username = str(record.get('username') or '').strip()
+    password = str(record.get('password') or '')
+    role = str(record.get('role') or '').strip().lower()
+    is_representative = record.get('is_representative', False)
+    if not isinstance(is_representative, bool):
+        is_representative = str(is_representative).strip().lower() in TRUE_VALUES
+
+    if not username:
+        return None, 'Missing username'
+    if len(username) > 80:
+        return None, 'Username is longer than 80 characters'
+    if not password:
+        return None, 'Missing password'
+    if role not in PROVISION_ROLES:
+        return None, f'Invalid role {role!r}'
+    if is_representative and role != 'student':
+        return None, 'Only students can be representatives'
+
+    return {
+        'username': username,
+        'password': password,
+        'role': role,
+        'is_representative': is_representative,
+    }, None
+
+class _HashPool:
+    """Process pool for password hashing, only started once a chunk is large enough"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = None
+
+    def hash_all(self, passwords):
+        if len(passwords) < POOL_THRESHOLD or self.workers < 2:
+            return [generate_password_hash(password) for password in passwords]
+        if self.executor is None:
+            # Never fork a threaded web worker
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        chunksize = max(1, len(passwords) // (4 * self.workers))
+        return list(self.executor.map(generate_password_hash, passwords, chunksize=chunksize))
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+def _new_user(fields, password_hash):
+    return User(
+        username=fields['username'],
+        password=password_hash,
+        role=fields['role'],
+        is_representative=fields['is_representative']
+    )
+
+def _insert_row(number, fields, password_hash, report):
+    """Insert a single account, reporting the constraint it violates"""
+    db.session.add(_new_user(fields, password_hash))
+    try:
+        db.session.commit()
+    except IntegrityError as e:
+        db.session.rollback()
+        report.append({'row': number, 'username': fields['username'],
+                       'status': 'error', 'message': f'Insert failed: {e.orig}'})
+        return 0
+    report.append({'row': number, 'username': fields['username'],
+                   'status': 'created', 'message': ''})
+    return 1
+
+def _insert_chunk(chunk, pool, report):
+    """Hash the passwords of a chunk and insert it in one transaction"""
+    hashes = pool.hash_all([fields['password'] for _, fields in chunk])
+
+    db.session.add_all([_new_user(fields, password_hash) for (_, fields), password_hash in zip(chunk, hashes)])
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # One bad row fails the whole chunk; retry row by row so the report names it
+        db.session.rollback()
+        return sum(_insert_row(number, fields, password_hash, report)
+                   for (number, fields), password_hash in zip(chunk, hashes))
+    except Exception as e:
+        db.session.rollback()
+        for number, fields in chunk:
+            report.append({'row': number, 'username': fields['username'],
+                           'status': 'error', 'message': f'Insert failed: {e.__class__.__name__}'})
+        return 0
+
+    for number, fields in chunk:
+        report.append({'row': number, 'username': fields['username'],
+                       'status': 'created', 'message': ''})
+    return len(chunk)
+
+def provision_users(rows, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Create accounts for every valid roster row.
+
+    Existing usernames are loaded with a single query, passwords of large
+    chunks are hashed across a process pool and accounts are committed in
+    chunks of ``chunk_size``. Returns (created_count, report) where report
+    holds one entry per input row.
+    """
+    existing = {username for (username,) in db.session.query(User.username)}
+    seen = set()
+    report = []
+    created = 0
+    chunk = []
+    pool = _HashPool(workers or os.cpu_count() or 1)
+
+    try:
+        for number, record in rows:
+            fields, error = parse_record(record)
+            if error:
+                username = record.get('username', '') if record else ''
+                report.append({'row': number, 'username': username,
+                               'status': 'error', 'message': error})
+                continue
+
+            username = fields['username']
+            if username in existing:
+                report.append({'row': number, 'username': username,
+                               'status': 'skipped', 'message': 'Username already exists'})
+                continue
+            if username in seen:
+                report.append({'row': number, 'username': username,
+                               'status': 'skipped', 'message': 'Duplicate username in roster'})
+                continue
+            seen.add(username)
+
+            chunk.append((number, fields))
+            if len(chunk) >= chunk_size:
+                created += _insert_chunk(chunk, pool, report)
+                chunk = []
+
+        if chunk:
+            created += _insert_chunk(chunk, pool, report)
+    finally:
+        pool.shutdown()
+
+    report.sort(key=lambda entry: entry['row'])
+    return created, report
+
+def write_report(report, stream):
+    """Write a per-row provisioning report as CSV"""
+    writer = csv.DictWriter(stream, fieldnames=REPORT_FIELDS)
+    writer.writeheader()
+    writer.writerows(report)
+
+def report_csv(report):
+    """Render a provisioning report to a CSV string"""
+    output = io.StringIO()
+    write_report(report, output)
+    return output.getvalue()
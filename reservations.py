@@ -0,0 +1,147 @@
+#reservations.py
+"""
+Composite reservations: several (venue, date, interval) legs booked all-or-nothing
+"""
+
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+from models import db, Booking, Venue
+from occupancy import record_booking, set_booking_status
+from waitlist import ROLE_PRIORITY, slot_bounds, overlaps
+
+# Venue-days are mapped onto a fixed set of lock stripes so the lock table never grows
+LOCK_STRIPES = 64
+_stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+MAX_LEGS = 20
+
+def _stripe(venue_id, date):
+    return zlib.crc32(f'{venue_id}:{date.isoformat()}'.encode()) % LOCK_STRIPES
+
+@contextmanager
+def lock_venue_days(venue_days):
+    """
+    Lock several venue-days for the duration of a reservation.
+
+    Locks are always taken in ascending order (stripes in-process, venue
+    rows in the database) so concurrent composite requests cannot deadlock.
+    """
+    stripes = sorted({_stripe(venue_id, date) for venue_id, date in venue_days})
+    acquired = []
+    try:
+        for index in stripes:
+            _stripes[index].acquire()
+            acquired.append(index)
+        # Row locks on databases that support SELECT ... FOR UPDATE; a no-op on SQLite
+        venue_ids = sorted({venue_id for venue_id, _ in venue_days})
+        Venue.query.filter(Venue.id.in_(venue_ids)).order_by(Venue.id).with_for_update().all()
+        yield
+    finally:
+        for index in reversed(acquired):
+            _stripes[index].release()
+
+def can_override(user, other):
+    """Faculty override students and representatives, representatives override regular students"""
+    rank = ROLE_PRIORITY.get(user.booking_role)
+    other_rank = ROLE_PRIORITY.get(other.booking_role)
+    if rank is None or other_rank is None or other.booking_role == 'faculty':
+        return False
+    return rank < other_rank
+
+def parse_legs(payload):
+    """Validate the legs of a reservation request, returning (legs, errors)"""
+    raw_legs = payload.get('legs') if isinstance(payload, dict) else None
+    if not isinstance(raw_legs, list) or not raw_legs:
+        return [], [{'leg': None, 'error': 'At least one leg is required'}]
+    if len(raw_legs) > MAX_LEGS:
+        return [], [{'leg': None, 'error': f'At most {MAX_LEGS} legs can be reserved at once'}]
+
+    legs = []
+    errors = []
+    for index, leg in enumerate(raw_legs):
+        try:
+            venue_id = int(leg['venue_id'])
+            date = datetime.strptime(leg['date'], '%Y-%m-%d').date()
+            start_time = datetime.strptime(leg['start_time'], '%H:%M').strftime('%H:%M')
+            end_time = datetime.strptime(leg['end_time'], '%H:%M').strftime('%H:%M')
+        except (KeyError, TypeError, ValueError):
+            errors.append({'leg': index, 'error': 'Each leg needs venue_id, date (YYYY-MM-DD), start_time and end_time (HH:MM)'})
+            continue
+        if end_time <= start_time:
+            errors.append({'leg': index, 'error': 'End time must be after start time.'})
+        elif start_time < '09:00' or end_time > '17:00':
+            errors.append({'leg': index, 'error': 'Booking time must be between 09:00 and 17:00.'})
+        else:
+            legs.append({'venue_id': venue_id, 'date': date, 'time_slot': f'{start_time}-{end_time}'})
+    return legs, errors
+
+def _resolve_conflicts(user, legs):
+    """Check every leg against approved bookings and each other, returning (overrides, errors)"""
+    errors = []
+    overrides = {}
+
+    approved = {}
+    for venue_id, date in {(leg['venue_id'], leg['date']) for leg in legs}:
+        approved[(venue_id, date)] = Booking.query.filter_by(
+            venue_id=venue_id, date=date, status='Approved'
+        ).all()
+
+    for index, leg in enumerate(legs):
+        bounds = slot_bounds(leg['time_slot'])
+
+        for other_index, other in enumerate(legs[:index]):
+            if (other['venue_id'], other['date']) == (leg['venue_id'], leg['date']) \
+                    and overlaps(bounds, slot_bounds(other['time_slot'])):
+                errors.append({'leg': index, 'error': f'Overlaps with leg {other_index} of this reservation'})
+
+        for booking in approved[(leg['venue_id'], leg['date'])]:
+            if not overlaps(bounds, slot_bounds(booking.time_slot)):
+                continue
+            if can_override(user, booking.user):
+                overrides[booking.id] = booking
+            else:
+                errors.append({'leg': index, 'error': f'Overlaps with an approved {booking.user.booking_role} booking ({booking.time_slot})'})
+    return list(overrides.values()), errors
+
+def reserve(user, legs):
+    """
+    Book every leg or none of them.
+
+    Returns (bookings, overridden, errors). On success the new Pending
+    bookings and any lower-priority bookings they overrode are committed in
+    a single transaction; on failure nothing is written.
+    """
+    venue_days = {(leg['venue_id'], leg['date']) for leg in legs}
+    with lock_venue_days(venue_days):
+        known = {venue_id for (venue_id,) in db.session.query(Venue.id).filter(
+            Venue.id.in_({venue_id for venue_id, _ in venue_days}))}
+        errors = [{'leg': index, 'error': 'Venue not found'}
+                  for index, leg in enumerate(legs) if leg['venue_id'] not in known]
+        if not errors:
+            overridden, errors = _resolve_conflicts(user, legs)
+        if errors:
+            db.session.rollback()
+            return [], [], errors
+
+        try:
+            for booking in overridden:
+                set_booking_status(booking, 'Rejected')
+                booking.override_by = user.id
+
+            bookings = [
+                Booking(user_id=user.id, venue_id=leg['venue_id'], date=leg['date'],
+                        time_slot=leg['time_slot'], status='Pending')
+                for leg in legs
+            ]
+            db.session.add_all(bookings)
+            db.session.flush()
+            for booking in bookings:
+                record_booking(booking)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    return bookings, overridden, []
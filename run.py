@@ -19,10 +19,11 @@ if __name__ == "__main__":
     print("-" * 30)
     
     try:
-        from app import app
-        app.run(debug=True, host='0.0.0.0', port=5000)
+        from app import create_app
+        create_app().run(debug=True, host='0.0.0.0', port=5000)
     except KeyboardInterrupt:
         print("\n👋 Server stopped")
     except Exception as e:
         print(f"❌ Error: {e}")
-        print("💡 Make sure you have installed dependencies: pip install -r requirements.txt") 
\ No newline at end of file
+        print("💡 Make sure you have installed dependencies: pip install -r requirements.txt")
+        print("💡 and initialised the database: flask --app app init-db && flask --app app seed") 
\ No newline at end of file
@@ -0,0 +1,207 @@
+#schedule.py
+"""
+Compact per venue-day schedule of approved bookings, cached for availability lookups
+"""
+
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+
+# Bookable hours, 09:00 to 17:00, in minutes since midnight
+OPEN_MINUTE = 9 * 60
+CLOSE_MINUTE = 17 * 60
+
+# Seconds a cached schedule is trusted; other worker processes cannot invalidate ours
+CACHE_TTL = 30
+CACHE_SIZE = 4096
+
+# Session.info key collecting venue-days changed in the open transaction
+CHANGED_KEY = 'changed_schedules'
+
+_RANGE = struct.Struct('<HHI')
+
+def to_minutes(value):
+    """Convert 'HH:MM' into minutes since midnight"""
+    hours, minutes = value.split(':')
+    return int(hours) * 60 + int(minutes)
+
+def format_minutes(value):
+    """Convert minutes since midnight into 'HH:MM'"""
+    return f'{value // 60:02d}:{value % 60:02d}'
+
+class DaySchedule:
+    """Occupied [start, end) minute ranges of one venue-day with the user who holds each"""
+
+    __slots__ = ('venue_id', 'date', 'starts', 'ends', 'owners', 'reach', 'users', 'built_at')
+
+    def __init__(self, venue_id, date, ranges, users=None):
+        ranges = sorted(ranges)
+        self.venue_id = venue_id
+        self.date = date
+        self.starts = array('H', [start for start, _, _ in ranges])
+        self.ends = array('H', [end for _, end, _ in ranges])
+        self.owners = array('I', [owner for _, _, owner in ranges])
+        # reach[i] is the latest end among ranges 0..i, so overlapping legacy rows still answer in O(log n)
+        self.reach = array('H')
+        latest = 0
+        for end in self.ends:
+            latest = max(latest, end)
+            self.reach.append(latest)
+        self.users = users or {}
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def from_bookings(cls, venue_id, date, bookings):
+        """Build a schedule from approved booking rows"""
+        ranges = []
+        users = {}
+        for booking in bookings:
+            start, end = booking.time_slot.split('-')
+            ranges.append((to_minutes(start), to_minutes(end), booking.user_id))
+            users[booking.user_id] = (booking.user.username, booking.user.role)
+        return cls(venue_id, date, ranges, users)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _candidates(self, start, end):
+        # Ranges starting before `end`; any of them ending after `start` overlaps
+        return bisect_left(self.starts, end)
+
+    def is_free(self, start, end):
+        """Whether [start, end) does not overlap any occupied range"""
+        count = self._candidates(start, end)
+        return count == 0 or self.reach[count - 1] <= start
+
+    def owner(self, start, end):
+        """User id of the earliest range overlapping [start, end), or None"""
+        count = self._candidates(start, end)
+        if count == 0 or self.reach[count - 1] <= start:
+            return None
+        for index in range(count):
+            if self.ends[index] > start:
+                return self.owners[index]
+        return None
+
+    def free_gaps(self, open_minute=OPEN_MINUTE, close_minute=CLOSE_MINUTE):
+        """List the free (start, end) intervals between opening and closing time"""
+        gaps = []
+        cursor = open_minute
+        for start, end in zip(self.starts, self.ends):
+            if start > cursor:
+                gaps.append((cursor, min(start, close_minute)))
+            cursor = max(cursor, end)
+            if cursor >= close_minute:
+                break
+        if cursor < close_minute:
+            gaps.append((cursor, close_minute))
+        return [(start, end) for start, end in gaps if start < end]
+
+    def slots(self, width=60, open_minute=OPEN_MINUTE, close_minute=CLOSE_MINUTE):
+        """Yield (start, end, owner) for fixed-width slots, the last one cut at closing time"""
+        for start in range(open_minute, close_minute, width):
+            end = min(start + width, close_minute)
+            yield start, end, self.owner(start, end)
+
+    def to_json(self):
+        """Compact JSON-ready form: [[start, end, owner], ...] in minutes"""
+        return {
+            'venue_id': self.venue_id,
+            'date': self.date.isoformat(),
+            'ranges': [list(item) for item in zip(self.starts, self.ends, self.owners)],
+        }
+
+    def to_bytes(self):
+        """Pack the ranges as little-endian (uint16 start, uint16 end, uint32 owner) records"""
+        return b''.join(_RANGE.pack(*item) for item in zip(self.starts, self.ends, self.owners))
+
+    @classmethod
+    def from_bytes(cls, venue_id, date, data):
+        return cls(venue_id, date, list(_RANGE.iter_unpack(data)))
+
+class ScheduleCache:
+    """Least recently built schedules of one app, safe to share between threads"""
+
+    def __init__(self, size=CACHE_SIZE, ttl=CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # key -> [generation, builds in flight]; only held while a build is running
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """Return the fresh schedule for ``key``, calling ``build()`` on a miss"""
+        with self._lock:
+            schedule = self._entries.get(key)
+            if schedule is not None and time.monotonic() - schedule.built_at <= self.ttl:
+                return schedule
+            state = self._building.setdefault(key, [0, 0])
+            state[1] += 1
+            generation = state[0]
+        # Built outside the lock; a commit invalidating the key meanwhile bumps its
+        # generation, and the possibly stale result is then returned but not stored
+        schedule = None
+        try:
+            schedule = build()
+        finally:
+            with self._lock:
+                state[1] -= 1
+                if state[1] == 0:
+                    del self._building[key]
+                if schedule is not None and state[0] == generation:
+                    self._entries.pop(key, None)
+                    self._entries[key] = schedule
+                    while len(self._entries) > self.size:
+                        self._entries.popitem(last=False)
+        return schedule
+
+    def invalidate(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                if key in self._building:
+                    self._building[key][0] += 1
+
+def init_schedule_cache(app, session):
+    """
+    Give an app its own schedule cache and hook ``session`` so the venue-days
+    marked with ``mark_schedule_changed`` are dropped once their transaction
+    commits, and forgotten if it rolls back.
+    """
+    app.extensions['day_schedule'] = ScheduleCache()
+    # The session is shared by every app, so hook it only once
+    if not event.contains(session, 'after_commit', invalidate_changed_schedules):
+        event.listen(session, 'after_commit', invalidate_changed_schedules)
+        event.listen(session, 'after_rollback', discard_changed_schedules)
+
+def get_schedule(venue_id, date, load):
+    """
+    Return the current app's cached schedule for a venue-day, building it with
+    ``load()`` (which returns the approved bookings) on a miss or once it is stale.
+    """
+    cache = current_app.extensions['day_schedule']
+    return cache.get((int(venue_id), date),
+                     lambda: DaySchedule.from_bookings(venue_id, date, load()))
+
+def mark_schedule_changed(session, venue_id, date):
+    """Remember a venue-day whose bookings change in the session's open transaction"""
+    session.info.setdefault(CHANGED_KEY, set()).add((int(venue_id), date))
+
+def invalidate_changed_schedules(session):
+    """after_commit hook: drop the venue-days changed by the committed transaction"""
+    keys = session.info.pop(CHANGED_KEY, None)
+    if keys and has_app_context():
+        cache = current_app.extensions.get('day_schedule')
+        if cache is not None:
+            cache.invalidate(keys)
+
+def discard_changed_schedules(session):
+    """after_rollback hook: nothing was written, so the cache stays valid"""
+    session.info.pop(CHANGED_KEY, None)
@@ -8,6 +8,7 @@ import os
 import sys
 import subprocess
 import platform
+import importlib.util
 
 def check_python_version():
     """Check if Python version is compatible"""
@@ -18,8 +19,15 @@ def check_python_version():
     print(f"✅ Python version: {sys.version.split()[0]}")
     return True
 
+def dependencies_installed():
+    """Check whether the packages from requirements.txt can already be imported"""
+    return all(importlib.util.find_spec(name) for name in ("flask", "flask_sqlalchemy", "werkzeug"))
+
 def install_dependencies():
     """Install required dependencies"""
+    if dependencies_installed():
+        print("✅ Dependencies already installed")
+        return True
     print("📦 Installing dependencies...")
     try:
         subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
@@ -38,6 +46,19 @@ def create_upload_folder():
     else:
         print("✅ Uploads folder already exists")
 
+def flask_command(*args):
+    """Run a flask CLI command against the application factory"""
+    return subprocess.run([sys.executable, "-m", "flask", "--app", "app", *args]).returncode == 0
+
+def initialise_database():
+    """Create (or migrate) the database schema and seed the default data"""
+    print("🗄️  Preparing database...")
+    if not (flask_command("migrate") and flask_command("seed")):
+        print("❌ Error preparing database")
+        return False
+    print("✅ Database ready")
+    return True
+
 def run_application():
     """Run the Flask application"""
     print("🚀 Starting Venue Booking System...")
@@ -69,6 +90,10 @@ def main():
     # Create upload folder
     create_upload_folder()
     
+    # Create or update the schema and seed data before the first start
+    if not initialise_database():
+        sys.exit(1)
+    
     print("\n🎉 Setup completed successfully!")
     print("\n📋 Quick Start Guide:")
     print("1. The application will start automatically")
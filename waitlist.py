@@ -0,0 +1,112 @@
+#waitlist.py
+"""
+Per venue-day waitlist of pending requests, promoted when approved time is freed
+"""
+
+import heapq
+from datetime import datetime
+
+from models import db, Booking
+from occupancy import set_booking_status
+from schedule import DaySchedule, to_minutes
+
+# Lower value wins: faculty > representative > student
+ROLE_PRIORITY = {'faculty': 0, 'representative': 1, 'student': 2}
+
+def slot_bounds(time_slot):
+    """Convert 'HH:MM-HH:MM' into a (start, end) pair of minutes"""
+    start, end = time_slot.split('-')
+    return to_minutes(start), to_minutes(end)
+
+def overlaps(a, b):
+    return a[0] < b[1] and b[0] < a[1]
+
+class Waitlist:
+    """Pending requests for one venue-day held in a heap, best candidate first"""
+
+    def __init__(self, venue_id, date, exclude=()):
+        # Built from one query per freed interval: pending rows change with every
+        # request and worker, so a long-lived heap would need cross-process invalidation
+        self.venue_id = venue_id
+        self.date = date
+        self._heap = []
+        pending = Booking.query.filter_by(venue_id=venue_id, date=date, status='Pending').all()
+        for booking in pending:
+            if not booking.promotion_flagged and booking.id not in exclude:
+                self._heap.append(self._entry(booking))
+        heapq.heapify(self._heap)
+
+    @staticmethod
+    def _entry(booking):
+        priority = ROLE_PRIORITY.get(booking.user.booking_role, len(ROLE_PRIORITY))
+        return (priority, booking.created_at or datetime.min, booking.id, booking)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, booking):
+        heapq.heappush(self._heap, self._entry(booking))
+
+    def pop(self):
+        return heapq.heappop(self._heap)[-1]
+
+    def best_fit(self, freed, taken):
+        """
+        Pop candidates in priority order and return the first one that
+        touches the freed interval and is free in the ``taken`` schedule.
+
+        Each candidate inspected costs an O(log n) pop plus an O(log m)
+        schedule lookup, and the search stops at the first fit. Candidates
+        that did not fit are pushed back.
+        """
+        skipped = []
+        found = None
+        while self._heap:
+            booking = self.pop()
+            start, end = slot_bounds(booking.time_slot)
+            if overlaps((start, end), freed) and taken.is_free(start, end):
+                found = booking
+                break
+            skipped.append(booking)
+        for booking in skipped:
+            self.push(booking)
+        return found
+
+def fill_freed_slot(venue_id, date, time_slot, auto_promote=False, exclude=()):
+    """
+    Offer a freed interval to the waitlist of its venue-day.
+
+    Candidates are matched best first until none of the rest fits in what
+    is left of the interval. Matches are approved when ``auto_promote`` is
+    set, otherwise flagged for one-click approval by an admin. Time held by
+    already flagged candidates and by bookings whose ids are in ``exclude``
+    (the request that freed the time, which is never offered it) counts as
+    taken.
+    Returns the matched bookings; the caller commits.
+    """
+    waitlist = Waitlist(venue_id, date, exclude)
+    if not waitlist:
+        return []
+
+    held = Booking.query.filter(
+        Booking.venue_id == venue_id,
+        Booking.date == date,
+        db.or_(Booking.status == 'Approved', Booking.promotion_flagged.is_(True), Booking.id.in_(list(exclude)))
+    ).all()
+    ranges = [slot_bounds(booking.time_slot) + (booking.user_id,) for booking in held]
+    freed = slot_bounds(time_slot)
+
+    matched = []
+    while waitlist:
+        booking = waitlist.best_fit(freed, DaySchedule(venue_id, date, ranges))
+        if booking is None:
+            break
+        ranges.append(slot_bounds(booking.time_slot) + (booking.user_id,))
+        matched.append(booking)
+
+    for booking in matched:
+        if auto_promote:
+            set_booking_status(booking, 'Approved')
+        else:
+            booking.promotion_flagged = True
+    return matched